@@ -1,16 +1,26 @@
 """Heatzy platform configuration."""
 from __future__ import annotations
 
+from datetime import datetime
 import logging
 
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_call_later
 
-from .const import DOMAIN, PLATFORMS
+from .const import ATTR_DURATION, DOMAIN, PLATFORMS, SERVICE_RECORD_CASSETTE
 from .coordinator import HeatzyDataUpdateCoordinator
+from .shedding import async_remove_storage
 
 _LOGGER = logging.getLogger(__name__)
 
+RECORD_CASSETTE_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_DURATION, default=300): cv.positive_int}
+)
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Heatzy as config entry."""
@@ -21,6 +31,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     hass.data[DOMAIN][entry.entry_id] = coordinator
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
+    if not hass.services.has_service(DOMAIN, SERVICE_RECORD_CASSETTE):
+        _async_register_services(hass)
 
     return True
 
@@ -28,5 +42,51 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator.index.async_release_all(coordinator)
+        await coordinator.async_stop_recording(_cassette_path(hass, entry.entry_id))
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove data stored for a deleted entry."""
+    await async_remove_storage(hass, entry.entry_id)
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply new options without reloading entities."""
+    hass.data[DOMAIN][entry.entry_id].async_update_options(entry)
+
+
+def _cassette_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Return cassette file of an entry."""
+    return hass.config.path(f"{DOMAIN}_{entry_id}.cassette.json")
+
+
+@callback
+def _async_register_services(hass: HomeAssistant) -> None:
+    """Register Heatzy services."""
+
+    async def async_record_cassette(call: ServiceCall) -> None:
+        """Record cloud traffic of every account for a while."""
+        for entry_id, coordinator in hass.data[DOMAIN].items():
+            if coordinator.recorder is not None:
+                continue
+            coordinator.async_start_recording()
+            _LOGGER.info("Recording cassette for %s", entry_id)
+
+            async def async_stop(
+                _: datetime,
+                coordinator: HeatzyDataUpdateCoordinator = coordinator,
+                path: str = _cassette_path(hass, entry_id),
+            ) -> None:
+                await coordinator.async_stop_recording(path)
+
+            async_call_later(hass, call.data[ATTR_DURATION], async_stop)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECORD_CASSETTE,
+        async_record_cassette,
+        schema=RECORD_CASSETTE_SCHEMA,
+    )
@@ -0,0 +1,150 @@
+"""Record and replay Heatzy cloud traffic."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from copy import deepcopy
+import json
+import logging
+import time
+from typing import Any
+
+from heatzypy import exception as heatzy_exception
+from heatzypy.exception import CommandFailed, HeatzyException, RetrieveFailed
+
+from homeassistant.components.diagnostics import async_redact_data
+
+from .const import CONF_ALIAS
+from .diagnostics import TO_REDACT
+
+_LOGGER = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+Request = Callable[..., Awaitable[Any]]
+
+
+class CassetteRecorder:
+    """Wrap a client request method and keep redacted interactions."""
+
+    def __init__(self, request: Request) -> None:
+        """Initialize recorder."""
+        self.request = request
+        self.interactions: list[dict[str, Any]] = []
+
+    async def __call__(self, service: str, method: str = "GET", **kwargs: Any) -> Any:
+        """Forward request and record it, with the error it raised if any."""
+        start = time.monotonic()
+        interaction: dict[str, Any] = {
+            "method": method,
+            "service": service,
+            "payload": async_redact_data(kwargs.get("json"), TO_REDACT),
+        }
+        try:
+            response = await self.request(service, method, **kwargs)
+        except HeatzyException as error:
+            interaction["error"] = {
+                "type": type(error).__name__,
+                "message": str(error),
+            }
+            raise
+        else:
+            interaction["response"] = async_redact_data(response, TO_REDACT)
+            return response
+        finally:
+            interaction["elapsed"] = round(time.monotonic() - start, 3)
+            self.interactions.append(interaction)
+
+    def save(self, path: str) -> None:
+        """Write cassette to disk (blocking)."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": CASSETTE_VERSION, "interactions": self.interactions},
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+        _LOGGER.debug("Cassette saved to %s (%s)", path, len(self.interactions))
+
+
+def load_cassette(path: str) -> list[dict[str, Any]]:
+    """Read cassette interactions from disk (blocking)."""
+    with open(path, encoding="utf-8") as file:
+        cassette = json.load(file)
+    if cassette.get("version") != CASSETTE_VERSION:
+        raise ValueError(f"Unsupported cassette version in {path}")
+    return cassette["interactions"]
+
+
+class CassetteTransport:
+    """Replay recorded interactions in place of the client request method.
+
+    `speed` divides recorded latencies (0 disables them) and `multiplicity`
+    clones every recorded device to simulate a larger fleet. Recorded errors
+    are raised again.
+    """
+
+    def __init__(
+        self,
+        interactions: list[dict[str, Any]],
+        speed: float = 1.0,
+        multiplicity: int = 1,
+    ) -> None:
+        """Initialize transport."""
+        self.speed = speed
+        self.multiplicity = multiplicity
+        self.calls = 0
+        self._tapes: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._position: dict[tuple[str, str], int] = {}
+        for interaction in interactions:
+            key = (interaction["method"], interaction["service"])
+            self._tapes.setdefault(key, []).append(interaction)
+
+    async def __call__(self, service: str, method: str = "GET", **kwargs: Any) -> Any:
+        """Return next recorded response for the request."""
+        self.calls += 1
+        clone = 0
+        if "/" in service:
+            prefix, device_id, *suffix = service.split("/")
+            device_id, _, index = device_id.partition("~")
+            clone = int(index or 0)
+            service = "/".join([prefix, device_id, *suffix])
+
+        key = (method, service)
+        if not (tape := self._tapes.get(key)):
+            if method == "GET":
+                raise RetrieveFailed(f"{service} not in cassette")
+            raise CommandFailed(f"Command failed {service} not in cassette")
+
+        position = self._position.get(key, 0)
+        self._position[key] = position + 1
+        interaction = tape[position % len(tape)]
+        if self.speed and (delay := interaction["elapsed"] / self.speed):
+            await asyncio.sleep(delay)
+
+        if error := interaction.get("error"):
+            raise getattr(heatzy_exception, error["type"], HeatzyException)(
+                error["message"]
+            )
+
+        response = deepcopy(interaction["response"])
+        if service == "bindings":
+            response["devices"] = [
+                self._clone(device, index)
+                for index in range(self.multiplicity)
+                for device in response.get("devices", [])
+            ]
+        elif clone and isinstance(response, dict) and "did" in response:
+            response["did"] = f"{response['did']}~{clone}"
+        return response
+
+    @staticmethod
+    def _clone(device: dict[str, Any], index: int) -> dict[str, Any]:
+        """Return copy of a bound device under a distinct id."""
+        if index == 0:
+            return device
+        return {
+            **device,
+            "did": f"{device['did']}~{index}",
+            CONF_ALIAS: f"{device.get(CONF_ALIAS)} {index}",
+        }
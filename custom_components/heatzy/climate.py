@@ -1,13 +1,16 @@
 """Climate sensors for Heatzy."""
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 import logging
 from typing import Any
 
 from heatzypy.exception import HeatzyException
+import voluptuous as vol
 from homeassistant.components.climate import (
     ATTR_TARGET_TEMP_HIGH,
     ATTR_TARGET_TEMP_LOW,
+    DOMAIN as CLIMATE_DOMAIN,
     PRESET_AWAY,
     PRESET_COMFORT,
     PRESET_ECO,
@@ -18,14 +21,21 @@ from homeassistant.components.climate import (
     HVACMode,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import UnitOfTemperature
+from homeassistant.const import ATTR_TIME, UnitOfTemperature
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
 from . import HeatzyDataUpdateCoordinator
 from .const import (
+    ATTR_COOLING_RATE,
+    ATTR_HEATING_RATE,
+    ATTR_PREHEAT_AT,
+    ATTR_PRIORITY,
+    ATTR_RATED_POWER,
     BLOOM,
     CFT_TEMP_H,
     CFT_TEMP_L,
@@ -46,6 +56,7 @@ from .const import (
     CONF_VERSION,
     CUR_TEMP_H,
     CUR_TEMP_L,
+    DEFAULT_PRIORITY,
     DOMAIN,
     ECO_TEMP_H,
     ECO_TEMP_L,
@@ -53,7 +64,11 @@ from .const import (
     GLOW,
     PILOTE_V1,
     PILOTE_V2,
+    SERVICE_PREHEAT,
+    SERVICE_SET_LOAD_SHEDDING,
 )
+from .entity import async_add_owned_entities
+from .shedding import HeatzyLoadShedder
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -63,18 +78,52 @@ async def async_setup_entry(
 ) -> None:
     """Load all Heatzy devices."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
-    entities: list[HeatzyThermostat] = []
-    for unique_id, device in coordinator.data.items():
-        product_key = device.get(CONF_PRODUCT_KEY)
+    shedder = HeatzyLoadShedder(hass, entry, coordinator)
+    entry.async_on_unload(await shedder.async_start())
+
+    @callback
+    def async_new_thermostat(unique_id: str) -> HeatzyThermostat | None:
+        """Return thermostat entity of a device."""
+        product_key = coordinator.data[unique_id].get(CONF_PRODUCT_KEY)
         if product_key in PILOTE_V1:
-            entities.append(HeatzyPiloteV1Thermostat(coordinator, unique_id))
-        elif product_key in PILOTE_V2:
-            entities.append(HeatzyPiloteV2Thermostat(coordinator, unique_id))
-        elif product_key in GLOW:
-            entities.append(Glowv1Thermostat(coordinator, unique_id))
-        elif product_key in BLOOM:
-            entities.append(Bloomv1Thermostat(coordinator, unique_id))
-    async_add_entities(entities)
+            return HeatzyPiloteV1Thermostat(coordinator, unique_id, shedder)
+        if product_key in PILOTE_V2:
+            return HeatzyPiloteV2Thermostat(coordinator, unique_id, shedder)
+        if product_key in GLOW:
+            return Glowv1Thermostat(coordinator, unique_id, shedder)
+        if product_key in BLOOM:
+            return Bloomv1Thermostat(coordinator, unique_id, shedder)
+        return None
+
+    entry.async_on_unload(
+        async_add_owned_entities(
+            coordinator,
+            CLIMATE_DOMAIN,
+            shedder.thermostats,
+            async_new_thermostat,
+            async_add_entities,
+        )
+    )
+
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_SET_LOAD_SHEDDING,
+        {
+            vol.Required(ATTR_RATED_POWER): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=5000)
+            ),
+            vol.Optional(ATTR_PRIORITY, default=DEFAULT_PRIORITY): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=10)
+            ),
+        },
+        "async_set_load_shedding",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PREHEAT,
+        {vol.Required(ATTR_TIME): cv.time},
+        "async_preheat",
+        [ClimateEntityFeature.TARGET_TEMPERATURE_RANGE],
+    )
 
 
 class HeatzyThermostat(CoordinatorEntity[HeatzyDataUpdateCoordinator], ClimateEntity):
@@ -90,13 +139,18 @@ class HeatzyThermostat(CoordinatorEntity[HeatzyDataUpdateCoordinator], ClimateEn
     _attr_temperature_unit = UnitOfTemperature.CELSIUS
     _attr_has_entity_name = True
     _attr_name = None
+    _preheat_at: datetime | None = None
 
     def __init__(
-        self, coordinator: HeatzyDataUpdateCoordinator, unique_id: str
+        self,
+        coordinator: HeatzyDataUpdateCoordinator,
+        unique_id: str,
+        shedder: HeatzyLoadShedder,
     ) -> None:
         """Init."""
         super().__init__(coordinator, context=unique_id)
         self._attr_unique_id = unique_id
+        self._shedder = shedder
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, unique_id)},
             manufacturer=DOMAIN,
@@ -106,6 +160,22 @@ class HeatzyThermostat(CoordinatorEntity[HeatzyDataUpdateCoordinator], ClimateEn
         )
         self._attr = coordinator.data[unique_id].get(CONF_ATTR, {})
 
+    @property
+    def available(self) -> bool:
+        """Return True if the device is connected to the cloud."""
+        return super().available and self.coordinator.is_online(self.unique_id)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return pre-heat time and learned heating rates."""
+        if (history := self.coordinator.history.get(self.unique_id)) is None:
+            return None
+        return {
+            ATTR_PREHEAT_AT: self._preheat_at,
+            ATTR_HEATING_RATE: history.heating_rate and round(history.heating_rate, 2),
+            ATTR_COOLING_RATE: history.cooling_rate and round(history.cooling_rate, 2),
+        }
+
     @property
     def hvac_action(self) -> HVACAction:
         """Return hvac action ie. heat, cool mode."""
@@ -141,9 +211,79 @@ class HeatzyThermostat(CoordinatorEntity[HeatzyDataUpdateCoordinator], ClimateEn
         """Turn device off."""
         await self.async_set_preset_mode(PRESET_NONE)
 
+    def preset_command(self, preset_mode: str) -> dict[str, Any]:
+        """Return command setting a preset mode."""
+        raise NotImplementedError()
+
+    def auto_command(self) -> dict[str, Any]:
+        """Return command turning Program mode on."""
+        raise NotImplementedError()
+
     async def async_turn_auto(self) -> None:
         """Turn device to Program mode."""
-        raise NotImplementedError()
+        try:
+            await self.coordinator.async_control_device(
+                self.unique_id, self.auto_command()
+            )
+            await self.coordinator.async_request_refresh()
+        except HeatzyException as error:
+            _LOGGER.error("Error to turn auto : %s (%s)", self.name, error)
+
+    async def async_set_preset_mode(self, preset_mode: str) -> None:
+        """Set new preset mode."""
+        try:
+            await self.coordinator.async_control_device(
+                self.unique_id, self.preset_command(preset_mode)
+            )
+            await self.coordinator.async_request_refresh()
+        except HeatzyException as error:
+            _LOGGER.error("Set preset mode (%s) %s (%s)", preset_mode, error, self.name)
+
+    async def async_set_load_shedding(self, rated_power: int, priority: int) -> None:
+        """Set rated power and priority used by load shedding, 0 W to exclude."""
+        await self._shedder.async_set_heater(self.unique_id, rated_power, priority)
+
+    async def async_preheat(self, **kwargs: Any) -> None:
+        """Switch to comfort early enough to be at temperature at given time."""
+        at_time = kwargs[ATTR_TIME]
+        now = dt_util.now()
+        preheat_at = now.replace(
+            hour=at_time.hour,
+            minute=at_time.minute,
+            second=at_time.second,
+            microsecond=0,
+        )
+        if preheat_at <= now:
+            preheat_at += timedelta(days=1)
+        self._preheat_at = preheat_at
+        self._async_check_preheat()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_check_preheat(self) -> None:
+        """Start comfort once the learned heating time is reached."""
+        if self._preheat_at is None or not self.available:
+            # Offline devices reject commands, start once back
+            return
+        if self.preset_mode == PRESET_COMFORT and self.hvac_mode != HVACMode.OFF:
+            self._preheat_at = None
+            return
+
+        remaining = max((self._preheat_at - dt_util.now()).total_seconds(), 0)
+        lead = 0.0
+        if (
+            (history := self.coordinator.history.get(self.unique_id))
+            and self.current_temperature is not None
+            and self.target_temperature_high
+        ):
+            lead = history.lead_time(
+                self.current_temperature, self.target_temperature_high, remaining
+            )
+        if remaining > lead:
+            return
+        _LOGGER.debug("Pre-heat %s, %s s before %s", self.name, lead, self._preheat_at)
+        self._preheat_at = None
+        self.hass.async_create_task(self.async_set_preset_mode(PRESET_COMFORT))
 
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Set new hvac mode."""
@@ -157,7 +297,11 @@ class HeatzyThermostat(CoordinatorEntity[HeatzyDataUpdateCoordinator], ClimateEn
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
+        if self.unique_id not in self.coordinator.data:
+            # Device removed from the account, entity is being retired
+            return
         self._attr = self.coordinator.data[self.unique_id].get(CONF_ATTR, {})
+        self._async_check_preheat()
         self.async_write_ha_state()
 
 
@@ -179,34 +323,20 @@ class HeatzyPiloteV1Thermostat(HeatzyThermostat):
 
     HEATZY_STOP = "\u505c\u6b62"
 
-    async def async_turn_auto(self) -> None:
-        """Turn device to Program mode."""
+    def auto_command(self) -> dict[str, Any]:
+        """Return command turning Program mode on."""
         # For PROGRAM Mode we have to set TIMER_SWITCH = 1, but we also ensure VACATION Mode is OFF
-        try:
-            await self.coordinator.api.async_control_device(
-                self.unique_id,
-                {
-                    "raw": {
-                        CONF_TIMER_SWITCH: 1,
-                        CONF_DEROG_MODE: 0,
-                        CONF_DEROG_TIME: 0,
-                    }
-                },
-            )
-            await self.coordinator.async_request_refresh()
-        except HeatzyException as error:
-            _LOGGER.error("Error to turn off : %s (%s)", self.name, error)
+        return {
+            "raw": {
+                CONF_TIMER_SWITCH: 1,
+                CONF_DEROG_MODE: 0,
+                CONF_DEROG_TIME: 0,
+            }
+        }
 
-    async def async_set_preset_mode(self, preset_mode: str) -> None:
-        """Set new preset mode."""
-        try:
-            await self.coordinator.api.async_control_device(
-                self.unique_id,
-                {"raw": self.HA_TO_HEATZY_STATE.get(preset_mode)},
-            )
-            await self.coordinator.async_request_refresh()
-        except HeatzyException as error:
-            _LOGGER.error("Set preset mode (%s) %s (%s)", preset_mode, error, self.name)
+    def preset_command(self, preset_mode: str) -> dict[str, Any]:
+        """Return command setting a preset mode."""
+        return {"raw": self.HA_TO_HEATZY_STATE.get(preset_mode)}
 
 
 class HeatzyPiloteV2Thermostat(HeatzyThermostat):
@@ -226,7 +356,7 @@ class HeatzyPiloteV2Thermostat(HeatzyThermostat):
                 self._attr.get(CONF_DEROG_MODE) == 1
                 or self._attr.get(CONF_TIMER_SWITCH) == 1
             ):
-                await self.coordinator.api.async_control_device(
+                await self.coordinator.async_control_device(
                     self.unique_id,
                     {
                         CONF_ATTRS: {
@@ -237,7 +367,7 @@ class HeatzyPiloteV2Thermostat(HeatzyThermostat):
                     },
                 )
                 await self.coordinator.async_request_refresh()
-            await self.coordinator.api.async_control_device(
+            await self.coordinator.async_control_device(
                 self.unique_id,
                 {CONF_ATTRS: {CONF_MODE: self.HA_TO_HEATZY_STATE[PRESET_COMFORT]}},
             )
@@ -252,7 +382,7 @@ class HeatzyPiloteV2Thermostat(HeatzyThermostat):
                 self._attr.get(CONF_DEROG_MODE) == 1
                 or self._attr.get(CONF_TIMER_SWITCH) == 1
             ):
-                await self.coordinator.api.async_control_device(
+                await self.coordinator.async_control_device(
                     self.unique_id,
                     {
                         CONF_ATTRS: {
@@ -263,7 +393,7 @@ class HeatzyPiloteV2Thermostat(HeatzyThermostat):
                     },
                 )
                 await self.coordinator.async_request_refresh()
-            await self.coordinator.api.async_control_device(
+            await self.coordinator.async_control_device(
                 self.unique_id,
                 {CONF_ATTRS: {CONF_MODE: self.HEATZY_STOP}},
             )
@@ -271,37 +401,26 @@ class HeatzyPiloteV2Thermostat(HeatzyThermostat):
         except HeatzyException as error:
             _LOGGER.error("Error Turn on %s (%s)", self.name, error)
 
-    async def async_turn_auto(self) -> None:
-        """Turn device to Program mode."""
+    def auto_command(self) -> dict[str, Any]:
+        """Return command turning Program mode on."""
         # For PROGRAM Mode we have to set TIMER_SWITCH = 1, but we also ensure VACATION Mode is OFF
-        try:
-            await self.coordinator.api.async_control_device(
-                self.unique_id,
-                {
-                    CONF_ATTRS: {
-                        CONF_TIMER_SWITCH: 1,
-                        CONF_DEROG_MODE: 0,
-                        CONF_DEROG_TIME: 0,
-                    }
-                },
-            )
-            await self.coordinator.async_request_refresh()
-        except HeatzyException as error:
-            _LOGGER.error("Error to turn off : %s (%s)", self.name, error)
+        return {
+            CONF_ATTRS: {
+                CONF_TIMER_SWITCH: 1,
+                CONF_DEROG_MODE: 0,
+                CONF_DEROG_TIME: 0,
+            }
+        }
 
-    async def async_set_preset_mode(self, preset_mode: str) -> None:
-        """Set new preset mode."""
+    def preset_command(self, preset_mode: str) -> dict[str, Any]:
+        """Return command setting a preset mode."""
         config: dict[str, Any] = {
             CONF_ATTRS: {CONF_MODE: self.HA_TO_HEATZY_STATE.get(preset_mode)}
         }
         # If in VACATION mode then as well as setting preset mode we also stop the VACATION mode
         if self._attr.get(CONF_DEROG_MODE) == 1:
             config[CONF_ATTRS].update({CONF_DEROG_MODE: 0, CONF_DEROG_TIME: 0})
-        try:
-            await self.coordinator.api.async_control_device(self.unique_id, config)
-            await self.coordinator.async_request_refresh()
-        except HeatzyException as error:
-            _LOGGER.error("Set preset mode (%s) %s (%s)", preset_mode, error, self.name)
+        return config
 
 
 class Glowv1Thermostat(HeatzyPiloteV2Thermostat):
@@ -395,7 +514,7 @@ class Glowv1Thermostat(HeatzyPiloteV2Thermostat):
         """Turn device on."""
         # When turning ON ensure PROGRAM and VACATION mode are OFF
         try:
-            await self.coordinator.api.async_control_device(
+            await self.coordinator.async_control_device(
                 self.unique_id,
                 {CONF_ATTRS: {CONF_ON_OFF: 1, CONF_DEROG_MODE: 0}},
             )
@@ -406,23 +525,17 @@ class Glowv1Thermostat(HeatzyPiloteV2Thermostat):
     async def async_turn_off(self) -> None:
         """Turn device off."""
         try:
-            await self.coordinator.api.async_control_device(
+            await self.coordinator.async_control_device(
                 self.unique_id, {CONF_ATTRS: {CONF_ON_OFF: 0, CONF_DEROG_MODE: 0}}
             )
             await self.coordinator.async_request_refresh()
         except HeatzyException as error:
             _LOGGER.error("Error to turn off : %s", error)
 
-    async def async_turn_auto(self) -> None:
-        """Turn device off."""
+    def auto_command(self) -> dict[str, Any]:
+        """Return command turning Program mode on."""
         # When setting to PROGRAM Mode we also ensure it's turned ON
-        try:
-            await self.coordinator.api.async_control_device(
-                self.unique_id, {CONF_ATTRS: {CONF_ON_OFF: 1, CONF_DEROG_MODE: 1}}
-            )
-            await self.coordinator.async_request_refresh()
-        except HeatzyException as error:
-            _LOGGER.error("Error to turn off : %s", error)
+        return {CONF_ATTRS: {CONF_ON_OFF: 1, CONF_DEROG_MODE: 1}}
 
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Set new target temperature."""
@@ -433,7 +546,7 @@ class Glowv1Thermostat(HeatzyPiloteV2Thermostat):
             self._attr[CFT_TEMP_L] = int(temp_cft * 10)
 
             try:
-                await self.coordinator.api.async_control_device(
+                await self.coordinator.async_control_device(
                     self.unique_id,
                     {
                         CONF_ATTRS: {
@@ -446,9 +559,9 @@ class Glowv1Thermostat(HeatzyPiloteV2Thermostat):
             except HeatzyException as error:
                 _LOGGER.error("Error to set temperature: %s", error)
 
-    async def async_set_preset_mode(self, preset_mode: str) -> None:
-        """Set new preset mode."""
-        config = {
+    def preset_command(self, preset_mode: str) -> dict[str, Any]:
+        """Return command setting a preset mode."""
+        config: dict[str, Any] = {
             CONF_ATTRS: {
                 CONF_MODE: self.HA_TO_HEATZY_STATE.get(preset_mode),
                 CONF_ON_OFF: 1,
@@ -457,11 +570,7 @@ class Glowv1Thermostat(HeatzyPiloteV2Thermostat):
         # If in VACATION mode then as well as setting preset mode we also stop the VACATION mode
         if self._attr.get(CONF_DEROG_MODE) == 2:
             config[CONF_ATTRS].update({CONF_DEROG_MODE: 0})
-        try:
-            await self.coordinator.api.async_control_device(self.unique_id, config)
-            await self.coordinator.async_request_refresh()
-        except HeatzyException as error:
-            _LOGGER.error("Set preset mode (%s) %s (%s)", preset_mode, error, self.name)
+        return config
 
 
 class Bloomv1Thermostat(HeatzyPiloteV2Thermostat):
@@ -525,7 +634,7 @@ class Bloomv1Thermostat(HeatzyPiloteV2Thermostat):
             self._attr[CONF_COM_TEMP] = temp_cft
 
             try:
-                await self.coordinator.api.async_control_device(
+                await self.coordinator.async_control_device(
                     self.unique_id,
                     {CONF_ATTRS: {CONF_COM_TEMP: temp_cft, CONF_ECO_TEMP: temp_eco}},
                 )
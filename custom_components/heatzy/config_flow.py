@@ -8,10 +8,33 @@ from heatzypy import HeatzyClient
 from heatzypy.exception import AuthenticationFailed, HeatzyException, HttpRequestFailed
 
 from homeassistant import config_entries
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.components.climate import PRESET_AWAY, PRESET_ECO
+from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
+from homeassistant.const import (
+    CONF_PASSWORD,
+    CONF_SCAN_INTERVAL,
+    CONF_TIMEOUT,
+    CONF_USERNAME,
+)
+from homeassistant.core import callback
+from homeassistant.helpers import selector
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
 
-from .const import DOMAIN
+from .const import (
+    API_TIMEOUT,
+    CONF_BATCH_SIZE,
+    CONF_CONCURRENCY,
+    CONF_DEBOUNCE_COOLDOWN,
+    CONF_POWER_BUDGET,
+    CONF_POWER_SENSOR,
+    CONF_SHED_PRESET,
+    DEBOUNCE_COOLDOWN,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_SHED_PRESET,
+    DOMAIN,
+    SCAN_INTERVAL,
+)
 
 DATA_SCHEMA = vol.Schema(
     {vol.Required(CONF_USERNAME): str, vol.Required(CONF_PASSWORD): str}
@@ -25,6 +48,14 @@ class HeatzyFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> HeatzyOptionsFlowHandler:
+        """Get option flow."""
+        return HeatzyOptionsFlowHandler(config_entry)
+
     async def async_step_user(self, user_input=None):
         """Handle a flow initialized by the user."""
         errors = {}
@@ -52,3 +83,72 @@ class HeatzyFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="user", data_schema=DATA_SCHEMA, errors=errors
         )
+
+
+class HeatzyOptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle tuning options of a Heatzy account."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+        # Each step updates its own options
+        self._options = dict(config_entry.options)
+
+    async def async_step_init(self, user_input=None):
+        """Handle options flow."""
+        if user_input is not None:
+            self._options.update(user_input)
+            return await self.async_step_load_shedding()
+
+        options = self.config_entry.options
+        options_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_SCAN_INTERVAL,
+                    default=options.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                vol.Required(
+                    CONF_TIMEOUT, default=options.get(CONF_TIMEOUT, API_TIMEOUT)
+                ): vol.All(vol.Coerce(int), vol.Range(min=5)),
+                vol.Required(
+                    CONF_DEBOUNCE_COOLDOWN,
+                    default=options.get(CONF_DEBOUNCE_COOLDOWN, DEBOUNCE_COOLDOWN),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Required(
+                    CONF_CONCURRENCY,
+                    default=options.get(CONF_CONCURRENCY, DEFAULT_CONCURRENCY),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=20)),
+                vol.Required(
+                    CONF_BATCH_SIZE,
+                    default=options.get(CONF_BATCH_SIZE, DEFAULT_BATCH_SIZE),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=options_schema)
+
+    async def async_step_load_shedding(self, user_input=None):
+        """Handle load shedding options."""
+        if user_input is not None:
+            self._options.pop(CONF_POWER_SENSOR, None)
+            self._options.update(user_input)
+            return self.async_create_entry(title="", data=self._options)
+
+        options = self.config_entry.options
+        options_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_POWER_BUDGET, default=options.get(CONF_POWER_BUDGET, 0)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_POWER_SENSOR,
+                    description={"suggested_value": options.get(CONF_POWER_SENSOR)},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain=SENSOR_DOMAIN)
+                ),
+                vol.Required(
+                    CONF_SHED_PRESET,
+                    default=options.get(CONF_SHED_PRESET, DEFAULT_SHED_PRESET),
+                ): vol.In([PRESET_ECO, PRESET_AWAY]),
+            }
+        )
+        return self.async_show_form(step_id="load_shedding", data_schema=options_schema)
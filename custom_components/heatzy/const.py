@@ -1,32 +1,78 @@
 """Constants for the Heatzy component."""
 ATTR_LOCK_SWITCH = "lock_switch"
+ATTR_PRIORITY = "priority"
+ATTR_RATED_POWER = "rated_power"
+ATTR_UPDATED_AT = "updated_at"
 API_TIMEOUT = 30
+ATTR_COOLING_RATE = "cooling_rate"
+ATTR_DID = "did"
+ATTR_DURATION = "duration"
+ATTR_HEATING_RATE = "heating_rate"
+ATTR_PREHEAT_AT = "preheat_at"
+BATCH_INTERVAL = 1
 CFT_TEMP_H = "cft_tempH"
 CFT_TEMP_L = "cft_tempL"
 CONF_ALIAS = "dev_alias"
 CONF_ATTR = "attr"
 CONF_ATTRS = "attrs"
+CONF_BATCH_SIZE = "batch_size"
 CONF_COM_TEMP = "com_temp"
+CONF_CONCURRENCY = "concurrency"
 CONF_CUR_MODE = "cur_mode"
 CONF_CUR_TEMP = "cur_temp"
+CONF_DEBOUNCE_COOLDOWN = "debounce_cooldown"
 CONF_DEROG_MODE = "derog_mode"
 CONF_DEROG_TIME = "derog_time"
 CONF_ECO_TEMP = "eco_temp"
+CONF_HEATERS = "heaters"
+CONF_IS_ONLINE = "is_online"
 CONF_LOCK = "lock_switch"
 CONF_MODE = "mode"
 CONF_MODEL = "product_name"
 CONF_ON_OFF = "on_off"
+CONF_POWER_BUDGET = "power_budget"
+CONF_POWER_SENSOR = "power_sensor"
 CONF_PRODUCT_KEY = "product_key"
+CONF_SHED_PRESET = "shed_preset"
 CONF_TIMER_SWITCH = "timer_switch"
 CONF_VERSION = "wifi_soft_version"
 CUR_TEMP_H = "cur_tempH"
 CUR_TEMP_L = "cur_tempL"
+DATA_DEVICE_INDEX = "heatzy_device_index"
 DEBOUNCE_COOLDOWN = 10
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_CONCURRENCY = 4
+DEFAULT_PRIORITY = 5
+DEFAULT_SHED_PRESET = "eco"
 DOMAIN = "heatzy"
 ECO_TEMP_H = "eco_tempH"
 ECO_TEMP_L = "eco_tempL"
+EVENT_DEVICE_CHANGED = "heatzy_device_changed"
 FROST_TEMP = 7
+HISTORY_RATE_WINDOW = 900
+HISTORY_SIZE = 720
+HISTORY_SMOOTHING = 0.3
+MIN_HEATING_RATE = 0.5
+OFFLINE_SCAN_INTERVAL = 600
 PLATFORMS = ["climate", "switch"]
+SCAN_INTERVAL = 60
+SERVICE_PREHEAT = "preheat"
+SERVICE_RECORD_CASSETTE = "record_cassette"
+SERVICE_SET_LOAD_SHEDDING = "set_load_shedding"
+SHED_COOLDOWN = 30
+SHED_HYSTERESIS = 0.1
+SHED_ROTATION = 1800
+STORAGE_VERSION = 1
+TRACKED_ATTRS = [
+    CONF_MODE,
+    CONF_CUR_MODE,
+    CONF_DEROG_MODE,
+    CONF_TIMER_SWITCH,
+    CONF_LOCK,
+    CONF_CUR_TEMP,
+    CONF_COM_TEMP,
+    CONF_ECO_TEMP,
+]
 
 PILOTE_V1 = ["9420ae048da545c88fc6274d204dd25f"]
 PILOTE_V2 = [
@@ -1,25 +1,74 @@
 """Coordinator Heatzy platform."""
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Awaitable, Callable
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
 
+from aiohttp import ClientError
 import async_timeout
 from heatzypy import HeatzyClient
 from heatzypy.exception import AuthenticationFailed, HeatzyException
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.const import (
+    ATTR_DEVICE_ID,
+    ATTR_NAME,
+    CONF_PASSWORD,
+    CONF_SCAN_INTERVAL,
+    CONF_TIMEOUT,
+    CONF_USERNAME,
+)
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryAuthFailed, HomeAssistantError
+from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
 from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
-from .const import API_TIMEOUT, DEBOUNCE_COOLDOWN, DOMAIN
+from .cassette import CassetteRecorder
+from .const import (
+    API_TIMEOUT,
+    ATTR_DID,
+    ATTR_UPDATED_AT,
+    BATCH_INTERVAL,
+    CFT_TEMP_H,
+    CFT_TEMP_L,
+    CONF_ALIAS,
+    CONF_ATTR,
+    CONF_BATCH_SIZE,
+    CONF_COM_TEMP,
+    CONF_CONCURRENCY,
+    CONF_CUR_MODE,
+    CONF_CUR_TEMP,
+    CONF_DEBOUNCE_COOLDOWN,
+    CONF_ECO_TEMP,
+    CONF_IS_ONLINE,
+    CONF_MODE,
+    CONF_ON_OFF,
+    CUR_TEMP_H,
+    CUR_TEMP_L,
+    DATA_DEVICE_INDEX,
+    DEBOUNCE_COOLDOWN,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    DOMAIN,
+    ECO_TEMP_H,
+    ECO_TEMP_L,
+    EVENT_DEVICE_CHANGED,
+    OFFLINE_SCAN_INTERVAL,
+    SCAN_INTERVAL,
+    TRACKED_ATTRS,
+)
+from .history import MODE_COOLING, MODE_HEATING, MODE_HOLDING, TemperatureHistory
+
+if TYPE_CHECKING:
+    from .shedding import HeatzyLoadShedder
 
 _LOGGER = logging.getLogger(__name__)
-SCAN_INTERVAL = 60
 
 
 class HeatzyDataUpdateCoordinator(DataUpdateCoordinator):
@@ -27,27 +76,405 @@ class HeatzyDataUpdateCoordinator(DataUpdateCoordinator):
 
     def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
         """Class to manage fetching Heatzy data API."""
+        self.debouncer = Debouncer(
+            hass, _LOGGER, cooldown=DEBOUNCE_COOLDOWN, immediate=False
+        )
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
             update_interval=timedelta(seconds=SCAN_INTERVAL),
-            request_refresh_debouncer=Debouncer(
-                hass, _LOGGER, cooldown=DEBOUNCE_COOLDOWN, immediate=False
-            ),
+            request_refresh_debouncer=self.debouncer,
         )
+        self.entry = entry
         self.api = HeatzyClient(
             entry.data[CONF_USERNAME],
             entry.data[CONF_PASSWORD],
             async_create_clientsession(hass),
         )
+        self.api_timeout = API_TIMEOUT
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self._concurrency = DEFAULT_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+        self._last_fetch: dict[str, datetime] = {}
+        self.recorder: CassetteRecorder | None = None
+        self.index: HeatzyDeviceIndex = hass.data.setdefault(
+            DATA_DEVICE_INDEX, HeatzyDeviceIndex()
+        )
+        self._bindings: dict[str, dict[str, Any]] = {}
+        self.history: dict[str, TemperatureHistory] = {}
+        self._tracked: dict[str, dict[str, Any]] = {}
+        self.polled_at: datetime | None = None
+        self.shedder: HeatzyLoadShedder | None = None
+        self.async_update_options(entry)
+
+    @callback
+    def async_update_options(self, entry: ConfigEntry) -> None:
+        """Apply tuning options to the running coordinator."""
+        options = entry.options
+        update_interval = timedelta(
+            seconds=options.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL)
+        )
+        if update_interval != self.update_interval:
+            self.update_interval = update_interval
+            if self._unsub_refresh:
+                # Count the new interval from now, not from the pending poll
+                self._next_refresh = None
+                self._schedule_refresh()
+        self.api_timeout = options.get(CONF_TIMEOUT, API_TIMEOUT)
+        self.debouncer.cooldown = options.get(CONF_DEBOUNCE_COOLDOWN, DEBOUNCE_COOLDOWN)
+        self.batch_size = options.get(CONF_BATCH_SIZE, DEFAULT_BATCH_SIZE)
+        concurrency = options.get(CONF_CONCURRENCY, DEFAULT_CONCURRENCY)
+        if concurrency != self._concurrency:
+            # Requests in flight release the previous semaphore
+            self._semaphore = asyncio.Semaphore(concurrency)
+            self._concurrency = concurrency
+
+    @callback
+    def async_start_recording(self) -> CassetteRecorder:
+        """Record client traffic until async_stop_recording is called."""
+        if self.recorder is None:
+            self.recorder = CassetteRecorder(self.api.request)
+            self.api.request = self.recorder
+        return self.recorder
+
+    async def async_stop_recording(self, path: str) -> None:
+        """Restore client transport and write the cassette."""
+        if (recorder := self.recorder) is None:
+            return
+        self.api.request = recorder.request
+        self.recorder = None
+        await self.hass.async_add_executor_job(recorder.save, path)
+
+    def is_owner(self, device_id: str) -> bool:
+        """Return True if this account polls and controls the device."""
+        return self.index.owner(device_id) in (None, self)
+
+    @callback
+    def async_update_shared(self, devices: dict[str, Any]) -> None:
+        """Merge states of shared devices polled by their owning account."""
+        if self.data is None:
+            return
+        for device_id, device in devices.items():
+            # Keep this account's binding, such as its alias for the device
+            self.data[device_id] = {**device, **self._bindings.get(device_id, {})}
+        self.async_update_listeners()
+
+    def is_online(self, device_id: str) -> bool:
+        """Return True if the cloud reports the device as connected."""
+        if self.data is None or device_id not in self.data:
+            return False
+        return self.data[device_id].get(CONF_IS_ONLINE, True) is not False
+
+    async def async_control_device(
+        self, device_id: str, payload: dict[str, Any]
+    ) -> None:
+        """Send a command, rejected while the device is offline.
+
+        Offline entities are unavailable, so commands are not queued for
+        later: a setting applied hours afterwards would surprise more than an
+        error now.
+        """
+        if (owner := self.index.owner(device_id)) not in (None, self):
+            await owner.async_control_device(device_id, payload)
+            return
+        if not self.is_online(device_id):
+            raise HomeAssistantError(f"Device {device_id} is offline")
+        await self._async_send(device_id, payload)
+
+    async def _async_send(self, device_id: str, payload: dict[str, Any]) -> None:
+        """Send a command, bounded by the concurrency limit."""
+        async with self._semaphore:
+            await self.api.async_control_device(device_id, payload)
+
+    async def async_send_batches(
+        self,
+        send: Callable[[str, Any], Awaitable[None]],
+        commands: dict[str, Any],
+    ) -> dict[str, HomeAssistantError | HeatzyException]:
+        """Call send for each device command, batch_size at a time."""
+        errors: dict[str, HomeAssistantError | HeatzyException] = {}
+        items = list(commands.items())
+        for index in range(0, len(items), self.batch_size):
+            if index:
+                await asyncio.sleep(BATCH_INTERVAL)
+            batch = items[index : index + self.batch_size]
+            results = await asyncio.gather(
+                *(send(device_id, payload) for device_id, payload in batch),
+                return_exceptions=True,
+            )
+            for (device_id, _), result in zip(batch, results):
+                if isinstance(result, (HomeAssistantError, HeatzyException)):
+                    errors[device_id] = result
+                elif isinstance(result, BaseException):
+                    raise result
+        return errors
 
     async def _async_update_data(self) -> dict:
         """Update data."""
+        started = dt_util.utcnow()
         try:
-            async with async_timeout.timeout(API_TIMEOUT):
-                return await self.api.async_get_devices()
+            async with async_timeout.timeout(self.api_timeout):
+                devices = await self._async_get_devices()
         except AuthenticationFailed as error:
+            self.index.async_hand_over(self)
             raise ConfigEntryAuthFailed from error
-        except HeatzyException as error:
-            raise UpdateFailed(error) from error
+        except (HeatzyException, asyncio.TimeoutError, ClientError) as error:
+            # heatzypy does not wrap timeouts and network errors
+            self.index.async_hand_over(self)
+            raise UpdateFailed(str(error) or "Timeout fetching data") from error
+
+        if self.data is not None and (removed := self.data.keys() - devices.keys()):
+            self._async_remove_devices(removed)
+        for device_id in devices:
+            self.index.async_claim(device_id, self)
+        self.index.async_publish(self, devices)
+        self._async_fire_changes(devices)
+        self._async_record_history(devices)
+        self.polled_at = started
+        return devices
+
+    @callback
+    def _async_record_history(self, devices: dict[str, Any]) -> None:
+        """Sample room temperatures of owned devices which report one."""
+        now = dt_util.utcnow().timestamp()
+        for device_id, device in devices.items():
+            if device.get(CONF_IS_ONLINE) is False or not self.is_owner(device_id):
+                continue
+            attr = device.get(CONF_ATTR, {})
+            state = _tracked_state(attr)
+            if (temperature := state[CONF_CUR_TEMP]) is None:
+                continue
+            if CUR_TEMP_L in attr:
+                # Glow
+                comfort = attr.get(CONF_ON_OFF) == 1 and attr.get(CONF_CUR_MODE) == 0
+            else:
+                comfort = attr.get(CONF_MODE) == "cft"
+            if not comfort:
+                mode = MODE_COOLING
+            elif state[CONF_COM_TEMP] and temperature < state[CONF_COM_TEMP]:
+                mode = MODE_HEATING
+            else:
+                mode = MODE_HOLDING
+            self.history.setdefault(device_id, TemperatureHistory()).add(
+                device.get(ATTR_UPDATED_AT, now), temperature, mode
+            )
+
+    @callback
+    def _async_fire_changes(self, devices: dict[str, Any]) -> None:
+        """Fire an event for each owned device whose tracked values changed.
+
+        Values are compared with those of the previous poll, kept apart since
+        entities update self.data in place when they send a command.
+        """
+        device_registry = dr.async_get(self.hass)
+        previous, self._tracked = self._tracked, {}
+        for device_id, device in devices.items():
+            new_state = self._tracked[device_id] = _tracked_state(
+                device.get(CONF_ATTR, {})
+            )
+            old_state = previous.get(device_id)
+            if old_state is None or not self.is_owner(device_id):
+                continue
+            if not (changed := [k for k, v in new_state.items() if old_state[k] != v]):
+                continue
+            device_entry = device_registry.async_get_device(
+                identifiers={(DOMAIN, device_id)}
+            )
+            self.hass.bus.async_fire(
+                EVENT_DEVICE_CHANGED,
+                {
+                    ATTR_DEVICE_ID: device_entry and device_entry.id,
+                    ATTR_DID: device_id,
+                    ATTR_NAME: device.get(CONF_ALIAS),
+                    "old": {key: old_state[key] for key in changed},
+                    "new": {key: new_state[key] for key in changed},
+                },
+            )
+
+    @callback
+    def _async_remove_devices(self, device_ids: set[str]) -> None:
+        """Detach devices unbound from the account, with their entities."""
+        device_registry = dr.async_get(self.hass)
+        for device_id in device_ids:
+            _LOGGER.debug("Device %s removed from account", device_id)
+            if device := device_registry.async_get_device(
+                identifiers={(DOMAIN, device_id)}
+            ):
+                device_registry.async_update_device(
+                    device.id, remove_config_entry_id=self.entry.entry_id
+                )
+            # Another account seeing the device takes over once entities are gone
+            self.index.async_release(device_id, self)
+
+    async def _async_get_devices(self) -> dict[str, Any]:
+        """Fetch bindings and device data, polling offline devices less often."""
+        now = dt_util.utcnow()
+        previous = self.data or {}
+        response = await self.api.async_bindings()
+        self._bindings = {
+            device["did"]: device for device in response.get("devices", [])
+        }
+        devices: dict[str, Any] = {}
+        to_fetch: list[dict[str, Any]] = []
+        for device_id, device in self._bindings.items():
+            # Claimed once fetched, a failed poll must not keep other accounts out
+            owner = self.index.owner(device_id)
+            if owner not in (None, self) and owner.data and device_id in owner.data:
+                # Shared with another account, use the state it polls
+                devices[device_id] = {**owner.data[device_id], **device}
+            elif (
+                device.get(CONF_IS_ONLINE) is False
+                and device_id in previous
+                and now - self._last_fetch.get(device_id, now)
+                < timedelta(seconds=OFFLINE_SCAN_INTERVAL)
+            ):
+                devices[device_id] = {**previous[device_id], **device}
+            else:
+                to_fetch.append(device)
+
+        for device, device_data in zip(
+            to_fetch,
+            await asyncio.gather(
+                *(self._async_get_device_data(device["did"]) for device in to_fetch)
+            ),
+        ):
+            devices[device["did"]] = {**device, **device_data}
+            self._last_fetch[device["did"]] = now
+
+        for device_id in set(self._last_fetch) - set(devices):
+            self._last_fetch.pop(device_id)
+            self.history.pop(device_id, None)
+
+        return devices
+
+    async def _async_get_device_data(self, device_id: str) -> dict[str, Any]:
+        """Fetch device data, bounded by the concurrency limit."""
+        async with self._semaphore:
+            return await self.api.async_get_device_data(device_id)
+
+
+def _temperature(attr: dict[str, Any], high: str, low: str) -> float | None:
+    """Return temperature split over two bytes (Glow), in degrees."""
+    if low not in attr:
+        return None
+    return (attr[low] + attr.get(high, 0) * 256) / 10
+
+
+def _tracked_state(attr: dict[str, Any]) -> dict[str, Any]:
+    """Return device values reported by change events."""
+    state = {key: attr.get(key) for key in TRACKED_ATTRS}
+    if state[CONF_CUR_TEMP] is None:
+        state[CONF_CUR_TEMP] = _temperature(attr, CUR_TEMP_H, CUR_TEMP_L)
+    if state[CONF_COM_TEMP] is None:
+        state[CONF_COM_TEMP] = _temperature(attr, CFT_TEMP_H, CFT_TEMP_L)
+    if state[CONF_ECO_TEMP] is None:
+        state[CONF_ECO_TEMP] = _temperature(attr, ECO_TEMP_H, ECO_TEMP_L)
+    return state
+
+
+class HeatzyDeviceIndex:
+    """Devices bound to several accounts, each polled by a single owner."""
+
+    def __init__(self) -> None:
+        """Initialize index."""
+        self._owners: dict[str, HeatzyDataUpdateCoordinator] = {}
+        self._members: dict[str, set[HeatzyDataUpdateCoordinator]] = {}
+        self._holders: dict[tuple[str, str], HeatzyDataUpdateCoordinator] = {}
+
+    def owner(self, device_id: str) -> HeatzyDataUpdateCoordinator | None:
+        """Return coordinator owning the device."""
+        return self._owners.get(device_id)
+
+    def holder(
+        self, platform: str, device_id: str
+    ) -> HeatzyDataUpdateCoordinator | None:
+        """Return coordinator whose platform has an entity for the device."""
+        return self._holders.get((platform, device_id))
+
+    @callback
+    def async_hold(
+        self, platform: str, device_id: str, coordinator: HeatzyDataUpdateCoordinator
+    ) -> CALLBACK_TYPE:
+        """Register an entity of the device, return a callback once removed."""
+        self._holders[(platform, device_id)] = coordinator
+
+        @callback
+        def async_drop() -> None:
+            if self._holders.get((platform, device_id)) is not coordinator:
+                return
+            del self._holders[(platform, device_id)]
+            if (owner := self._owners.get(device_id)) not in (None, coordinator):
+                # Let the new owner create its entity
+                owner.async_update_listeners()
+
+        return async_drop
+
+    @callback
+    def async_claim(
+        self, device_id: str, coordinator: HeatzyDataUpdateCoordinator
+    ) -> HeatzyDataUpdateCoordinator:
+        """Register a coordinator seeing the device, return its owner."""
+        self._members.setdefault(device_id, set()).add(coordinator)
+        return self._owners.setdefault(device_id, coordinator)
+
+    @callback
+    def async_release(
+        self, device_id: str, coordinator: HeatzyDataUpdateCoordinator
+    ) -> None:
+        """Unregister a coordinator, handing ownership over if needed."""
+        members = self._members.get(device_id, set())
+        members.discard(coordinator)
+        if not members:
+            self._members.pop(device_id, None)
+            self._owners.pop(device_id, None)
+            return
+        if self._owners.get(device_id) is coordinator:
+            owner = self._owners[device_id] = next(iter(members))
+            _LOGGER.debug("Device %s now owned by %s", device_id, owner.entry.title)
+            # Let the platforms of the new owner create the entities once free
+            owner.async_update_listeners()
+
+    @callback
+    def async_hand_over(self, coordinator: HeatzyDataUpdateCoordinator) -> None:
+        """Pass devices of a failing owner to accounts still polling them."""
+        owners: set[HeatzyDataUpdateCoordinator] = set()
+        for device_id, owner in self._owners.items():
+            if owner is not coordinator:
+                continue
+            for member in self._members[device_id] - {coordinator}:
+                if member.last_update_success:
+                    self._owners[device_id] = member
+                    owners.add(member)
+                    _LOGGER.debug(
+                        "Device %s now owned by %s", device_id, member.entry.title
+                    )
+                    break
+        for owner in owners:
+            # Refresh the shared states and create the entities once free
+            owner.async_update_listeners()
+            owner.hass.async_create_task(owner.async_request_refresh())
+
+    @callback
+    def async_release_all(self, coordinator: HeatzyDataUpdateCoordinator) -> None:
+        """Unregister a coordinator from all its devices."""
+        for device_id in [
+            device_id
+            for device_id, members in self._members.items()
+            if coordinator in members
+        ]:
+            self.async_release(device_id, coordinator)
+
+    @callback
+    def async_publish(
+        self, coordinator: HeatzyDataUpdateCoordinator, devices: dict[str, Any]
+    ) -> None:
+        """Share states polled by an owner with the other accounts."""
+        shared: dict[HeatzyDataUpdateCoordinator, dict[str, Any]] = {}
+        for device_id, device in devices.items():
+            if self._owners.get(device_id) is not coordinator:
+                continue
+            for member in self._members[device_id] - {coordinator}:
+                shared.setdefault(member, {})[device_id] = device
+        for member, member_devices in shared.items():
+            member.async_update_shared(member_devices)
@@ -0,0 +1,60 @@
+"""Entities of the devices owned by a Heatzy account."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TypeVar
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .coordinator import HeatzyDataUpdateCoordinator
+
+_EntityT = TypeVar("_EntityT", bound=Entity)
+
+
+@callback
+def async_add_owned_entities(
+    coordinator: HeatzyDataUpdateCoordinator,
+    platform: str,
+    entities: dict[str, _EntityT],
+    new_entity: Callable[[str], _EntityT | None],
+    async_add_entities: AddEntitiesCallback,
+) -> CALLBACK_TYPE:
+    """Keep entities, by device id, for the devices the account owns.
+
+    Devices shared with another account get entities from their owner. When
+    ownership moves, the previous owner removes its entity before the new one
+    creates its own under the same unique id.
+    """
+    known_ids: set[str] = set()
+
+    @callback
+    def async_update_entities() -> None:
+        """Add entities of new devices and remove those handed over."""
+        owned_ids = set(filter(coordinator.is_owner, coordinator.data))
+        for device_id in known_ids - owned_ids:
+            known_ids.discard(device_id)
+            entity = entities.pop(device_id, None)
+            if entity is not None and device_id in coordinator.data:
+                # Devices unbound from the account are removed with the registry
+                coordinator.hass.async_create_task(entity.async_remove())
+
+        new_entities: list[_EntityT] = []
+        for device_id in owned_ids - known_ids:
+            if coordinator.index.holder(platform, device_id) not in (None, coordinator):
+                # Retried once the previous owner has removed its entity
+                continue
+            known_ids.add(device_id)
+            if (entity := new_entity(device_id)) is None:
+                continue
+            entity.async_on_remove(
+                coordinator.index.async_hold(platform, device_id, coordinator)
+            )
+            entities[device_id] = entity
+            new_entities.append(entity)
+        if new_entities:
+            async_add_entities(new_entities)
+
+    async_update_entities()
+    return coordinator.async_add_listener(async_update_entities)
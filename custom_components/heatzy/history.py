@@ -0,0 +1,90 @@
+"""Temperature history and heating rates for Heatzy."""
+from __future__ import annotations
+
+from array import array
+
+from .const import (
+    HISTORY_RATE_WINDOW,
+    HISTORY_SIZE,
+    HISTORY_SMOOTHING,
+    MIN_HEATING_RATE,
+)
+
+MODE_HOLDING = -1
+MODE_COOLING = 0
+MODE_HEATING = 1
+
+
+class TemperatureHistory:
+    """Ring buffer of temperature and mode samples of a device.
+
+    Heating and cooling rates (degrees per hour) are smoothed each time a run
+    of samples in the same mode spans HISTORY_RATE_WINDOW seconds. Samples
+    held at the comfort temperature do not count toward either rate.
+    """
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        """Initialize buffers."""
+        self.size = size
+        self.timestamps = array("d", bytes(8 * size))
+        self.temperatures = array("f", bytes(4 * size))
+        self.modes = array("b", bytes(size))
+        self.count = 0
+        self.heating_rate: float | None = None
+        self.cooling_rate: float | None = None
+        self._run_start: int | None = None
+
+    def __len__(self) -> int:
+        """Return number of samples kept."""
+        return min(self.count, self.size)
+
+    def add(self, timestamp: float, temperature: float, mode: int) -> None:
+        """Append a sample and update rates."""
+        if self.count and timestamp <= self.timestamps[(self.count - 1) % self.size]:
+            # Same device report polled again
+            return
+        index = self.count % self.size
+        self.timestamps[index] = timestamp
+        self.temperatures[index] = temperature
+        self.modes[index] = mode
+        self.count += 1
+
+        start = self._run_start
+        if (
+            start is None
+            or self.count - start > self.size
+            or self.modes[start % self.size] != mode
+        ):
+            # New run, or its start was overwritten
+            self._run_start = self.count - 1
+            return
+
+        elapsed = timestamp - self.timestamps[start % self.size]
+        if mode == MODE_HOLDING or elapsed < HISTORY_RATE_WINDOW:
+            return
+        rate = (temperature - self.temperatures[start % self.size]) * 3600 / elapsed
+        if mode == MODE_HEATING:
+            self.heating_rate = self._smooth(self.heating_rate, rate)
+        else:
+            self.cooling_rate = self._smooth(self.cooling_rate, -rate)
+        self._run_start = self.count - 1
+
+    @staticmethod
+    def _smooth(average: float | None, value: float) -> float:
+        """Return exponential moving average."""
+        if average is None:
+            return value
+        return average + HISTORY_SMOOTHING * (value - average)
+
+    def lead_time(self, current: float, target: float, remaining: float) -> float:
+        """Return seconds of heating needed to reach target in remaining seconds.
+
+        The room cools down until heating starts, then warms at heating_rate.
+        Without a learned heating rate, heating starts on time.
+        """
+        if self.heating_rate is None:
+            return 0
+        heating = max(self.heating_rate, MIN_HEATING_RATE) / 3600
+        cooling = max(self.cooling_rate or 0, 0) / 3600
+        lead = (target - current + cooling * remaining) / (heating + cooling)
+        return min(max(lead, 0), remaining)
@@ -0,0 +1,431 @@
+"""Power budget load shedding for Heatzy."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.climate import PRESET_COMFORT, HVACAction, HVACMode
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_PRIORITY,
+    ATTR_RATED_POWER,
+    CONF_HEATERS,
+    CONF_POWER_BUDGET,
+    CONF_POWER_SENSOR,
+    CONF_SHED_PRESET,
+    DEFAULT_PRIORITY,
+    DEFAULT_SHED_PRESET,
+    DOMAIN,
+    SHED_COOLDOWN,
+    SHED_HYSTERESIS,
+    SHED_ROTATION,
+    STORAGE_VERSION,
+)
+from .coordinator import HeatzyDataUpdateCoordinator
+
+if TYPE_CHECKING:
+    from .climate import HeatzyThermostat
+
+_LOGGER = logging.getLogger(__name__)
+
+NEVER = dt_util.utc_from_timestamp(0)
+
+ATTR_SHED = "shed"
+
+
+def _store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return storage of heater ratings and shed heaters of an entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.shedding.{entry_id}")
+
+
+async def async_remove_storage(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove load shedding storage of a deleted entry."""
+    await _store(hass, entry_id).async_remove()
+
+
+@dataclass
+class ShedHeater:
+    """Preset to restore on a shed heater."""
+
+    shed_at: datetime
+    hvac_mode: HVACMode | None
+    preset_mode: str | None
+    confirmed: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> ShedHeater:
+        """Return shed heater from storage."""
+        return cls(
+            dt_util.parse_datetime(data["shed_at"]) or NEVER,
+            data["hvac_mode"] and HVACMode(data["hvac_mode"]),
+            data["preset_mode"],
+            data["confirmed"],
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return shed heater for storage."""
+        return {**asdict(self), "shed_at": self.shed_at.isoformat()}
+
+
+class HeatzyLoadShedder:
+    """Move low priority heaters to a lower preset while over power budget."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: HeatzyDataUpdateCoordinator,
+    ) -> None:
+        """Initialize shedder."""
+        self.hass = hass
+        self.entry = entry
+        self.coordinator = coordinator
+        self.thermostats: dict[str, HeatzyThermostat] = {}
+        self.heaters: dict[str, dict[str, int]] = {}
+        self.shed: dict[str, ShedHeater] = {}
+        self._store = _store(hass, entry.entry_id)
+        self._last_shed: dict[str, datetime] = {}
+        self._unsub_sensor: CALLBACK_TYPE | None = None
+        self._debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=SHED_COOLDOWN,
+            immediate=True,
+            function=self._async_evaluate,
+        )
+
+    async def async_start(self) -> CALLBACK_TYPE:
+        """Start evaluating the budget, return a callback to stop.
+
+        Heaters still shed when Home Assistant stopped are restored from
+        storage like any other.
+        """
+        data = await self._store.async_load() or {}
+        self.heaters = data.get(CONF_HEATERS, {})
+        self.shed = {
+            device_id: ShedHeater.from_dict(shed)
+            for device_id, shed in data.get(ATTR_SHED, {}).items()
+        }
+
+        self.coordinator.shedder = self
+        unsub_coordinator = self.coordinator.async_add_listener(self.async_schedule)
+        unsub_options = self.entry.add_update_listener(self._async_options_updated)
+        self._async_track_sensor()
+
+        @callback
+        def async_stop() -> None:
+            self.coordinator.shedder = None
+            unsub_coordinator()
+            unsub_options()
+            if self._unsub_sensor:
+                self._unsub_sensor()
+            self._debouncer.async_cancel()
+            if self.shed:
+                self.hass.async_create_task(self._async_restore_all())
+
+        return async_stop
+
+    @callback
+    def async_schedule(self, *_: Any) -> None:
+        """Request a budget evaluation."""
+        self.hass.async_create_task(self._debouncer.async_call())
+
+    async def _async_options_updated(
+        self, hass: HomeAssistant, entry: ConfigEntry
+    ) -> None:
+        """Follow power sensor changes and re-evaluate."""
+        self._async_track_sensor()
+        self.async_schedule()
+
+    @callback
+    def _async_track_sensor(self) -> None:
+        """Re-evaluate whenever the power sensor changes."""
+        if self._unsub_sensor:
+            self._unsub_sensor()
+            self._unsub_sensor = None
+        if sensor := self.entry.options.get(CONF_POWER_SENSOR):
+            self._unsub_sensor = async_track_state_change_event(
+                self.hass, [sensor], self._async_sensor_changed
+            )
+
+    @callback
+    def _async_sensor_changed(self, event: Event) -> None:
+        """Handle power sensor update."""
+        self.async_schedule()
+
+    async def async_set_heater(
+        self, device_id: str, rated_power: int, priority: int
+    ) -> None:
+        """Set rated power and priority of a heater, 0 W to exclude it."""
+        self.heaters.pop(device_id, None)
+        if rated_power:
+            self.heaters[device_id] = {
+                ATTR_RATED_POWER: rated_power,
+                ATTR_PRIORITY: priority,
+            }
+        await self._async_save()
+        self.async_schedule()
+
+    @callback
+    def async_adopt(
+        self, device_id: str, shed: ShedHeater, heater: dict[str, int] | None
+    ) -> None:
+        """Take over a shed heater from the account that owned it before."""
+        if heater:
+            self.heaters.setdefault(device_id, heater)
+        self.shed.setdefault(device_id, shed)
+        self.hass.async_create_task(self._async_save())
+        self.async_schedule()
+
+    @callback
+    def _async_hand_over(self) -> None:
+        """Pass shed heaters now owned by another account to its shedder."""
+        for device_id in list(self.shed):
+            owner = self.coordinator.index.owner(device_id)
+            if owner in (None, self.coordinator) or owner.shedder is None:
+                continue
+            owner.shedder.async_adopt(
+                device_id, self.shed.pop(device_id), self.heaters.get(device_id)
+            )
+
+    async def _async_save(self) -> None:
+        """Store heater ratings and shed heaters."""
+        await self._store.async_save(
+            {
+                CONF_HEATERS: self.heaters,
+                ATTR_SHED: {
+                    device_id: shed.as_dict() for device_id, shed in self.shed.items()
+                },
+            }
+        )
+
+    def _heater(self, device_id: str) -> dict[str, Any]:
+        """Return rated power and priority of a heater."""
+        return self.heaters.get(device_id, {})
+
+    def _power(self, device_id: str) -> int:
+        """Return rated power of a heater in W."""
+        return self._heater(device_id).get(ATTR_RATED_POWER, 0)
+
+    def _priority(self, device_id: str) -> int:
+        """Return priority of a heater, lowest is shed first."""
+        return self._heater(device_id).get(ATTR_PRIORITY, DEFAULT_PRIORITY)
+
+    @staticmethod
+    def _is_heating(thermostat: HeatzyThermostat) -> bool:
+        """Return True if the heater draws its rated power."""
+        return (
+            thermostat.preset_mode == PRESET_COMFORT
+            and thermostat.hvac_mode != HVACMode.OFF
+            and thermostat.hvac_action == HVACAction.HEATING
+        )
+
+    def _load(self, heaters: dict[str, HeatzyThermostat]) -> float | None:
+        """Return current load, measured or estimated from heaters."""
+        if sensor := self.entry.options.get(CONF_POWER_SENSOR):
+            state = self.hass.states.get(sensor)
+            if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+                return None
+            try:
+                return float(state.state)
+            except ValueError:
+                return None
+        return sum(
+            self._power(device_id)
+            for device_id, thermostat in heaters.items()
+            if self._is_heating(thermostat)
+        )
+
+    async def _async_evaluate(self) -> None:
+        """Shed, restore or rotate heaters to stay within the budget."""
+        stored = {device_id: shed.as_dict() for device_id, shed in self.shed.items()}
+        self._async_hand_over()
+        if not (budget := self.entry.options.get(CONF_POWER_BUDGET, 0)):
+            if stored != {
+                device_id: shed.as_dict() for device_id, shed in self.shed.items()
+            }:
+                await self._async_save()
+            await self._async_restore_all()
+            return
+
+        heaters = {
+            device_id: thermostat
+            for device_id, thermostat in self.thermostats.items()
+            if self._power(device_id)
+            and thermostat.available
+            and self.coordinator.is_owner(device_id)
+        }
+        shed_preset = self.entry.options.get(CONF_SHED_PRESET, DEFAULT_SHED_PRESET)
+        polled_at = self.coordinator.polled_at
+        for device_id, shed in list(self.shed.items()):
+            if device_id not in self.coordinator.data:
+                self.shed.pop(device_id)
+            elif device_id not in heaters:
+                # Offline heaters reject commands, restore them once back
+                continue
+            elif heaters[device_id].preset_mode == shed_preset:
+                shed.confirmed = True
+            elif shed.confirmed:
+                # Changed by someone else since, nothing to restore anymore
+                self.shed.pop(device_id)
+            elif polled_at is not None and polled_at > shed.shed_at:
+                # Polled since the command and still not shed, it was not applied
+                self.shed.pop(device_id)
+
+        if (load := self._load(heaters)) is not None:
+            await self._async_balance(heaters, load, budget, shed_preset)
+        if stored != {
+            device_id: shed.as_dict() for device_id, shed in self.shed.items()
+        }:
+            await self._async_save()
+
+    async def _async_balance(
+        self,
+        heaters: dict[str, HeatzyThermostat],
+        load: float,
+        budget: int,
+        shed_preset: str,
+    ) -> None:
+        """Send the shed and restore commands bringing the load within budget."""
+        now = dt_util.utcnow()
+        # Heaters to restore and to shed together, a rotation swaps a pair
+        moves: list[tuple[list[str], list[str]]] = []
+        candidates = sorted(
+            (
+                device_id
+                for device_id, thermostat in heaters.items()
+                if device_id not in self.shed and self._is_heating(thermostat)
+            ),
+            key=lambda device_id: (
+                self._priority(device_id),
+                self._last_shed.get(device_id, NEVER),
+            ),
+        )
+
+        if load > budget:
+            for device_id in candidates:
+                if load <= budget:
+                    break
+                moves.append(([], [device_id]))
+                load -= self._power(device_id)
+        else:
+            restored: set[str] = set()
+            for device_id in sorted(
+                self.shed.keys() & heaters.keys(),
+                key=lambda device_id: (
+                    -self._priority(device_id),
+                    self.shed[device_id].shed_at,
+                ),
+            ):
+                if load + self._power(device_id) > budget * (1 - SHED_HYSTERESIS):
+                    continue
+                moves.append(([device_id], []))
+                restored.add(device_id)
+                load += self._power(device_id)
+
+            # Rotate heaters shed for long with equivalent ones still heating
+            rotated: set[str] = set()
+            for device_id, shed in list(self.shed.items()):
+                if (
+                    device_id in restored
+                    or device_id not in heaters
+                    or now - shed.shed_at < timedelta(seconds=SHED_ROTATION)
+                ):
+                    continue
+                for candidate in candidates:
+                    if (
+                        candidate not in rotated
+                        and self._priority(candidate) <= self._priority(device_id)
+                        and self._power(candidate) >= self._power(device_id)
+                    ):
+                        moves.append(([device_id], [candidate]))
+                        rotated.add(candidate)
+                        break
+
+        # At most batch_size commands, the rest waits for the next evaluation
+        to_restore: list[str] = []
+        to_shed: list[str] = []
+        for restore, shed in moves:
+            count = len(to_restore) + len(to_shed) + len(restore) + len(shed)
+            if count > self.coordinator.batch_size and (to_restore or to_shed):
+                break
+            to_restore += restore
+            to_shed += shed
+
+        restored = {device_id: self.shed.pop(device_id) for device_id in to_restore}
+        commands = {
+            device_id: self._restore_command(device_id, shed)
+            for device_id, shed in restored.items()
+        }
+        for device_id in to_shed:
+            thermostat = heaters[device_id]
+            self.shed[device_id] = ShedHeater(
+                now, thermostat.hvac_mode, thermostat.preset_mode
+            )
+            self._last_shed[device_id] = now
+            commands[device_id] = thermostat.preset_command(shed_preset)
+
+        if commands:
+            _LOGGER.debug(
+                "Load %s W for budget %s W, shed %s, restore %s",
+                load,
+                budget,
+                to_shed,
+                to_restore,
+            )
+            for device_id in await self._async_send(commands):
+                # Failed heaters keep their previous state
+                if device_id in restored:
+                    self.shed[device_id] = restored[device_id]
+                else:
+                    self.shed.pop(device_id, None)
+
+    def _restore_command(self, device_id: str, shed: ShedHeater) -> dict[str, Any]:
+        """Return command restoring a heater as it was before shedding."""
+        thermostat = self.thermostats[device_id]
+        if shed.hvac_mode == HVACMode.AUTO:
+            return thermostat.auto_command()
+        return thermostat.preset_command(shed.preset_mode or PRESET_COMFORT)
+
+    async def _async_restore_all(self) -> None:
+        """Restore every shed heater, keeping offline ones for later."""
+        count = len(self.shed)
+        restored: dict[str, ShedHeater] = {}
+        for device_id in list(self.shed):
+            if device_id not in self.coordinator.data:
+                self.shed.pop(device_id)
+            elif device_id not in self.thermostats:
+                # Entity of the new owner not created yet
+                continue
+            elif self.thermostats[device_id].available:
+                restored[device_id] = self.shed.pop(device_id)
+        if restored:
+            errors = await self._async_send(
+                {
+                    device_id: self._restore_command(device_id, shed)
+                    for device_id, shed in restored.items()
+                }
+            )
+            for device_id in errors:
+                self.shed[device_id] = restored[device_id]
+        if len(self.shed) != count:
+            await self._async_save()
+
+    async def _async_send(self, commands: dict[str, dict[str, Any]]) -> set[str]:
+        """Send commands in batches, return devices whose command failed."""
+        errors = await self.coordinator.async_send_batches(
+            self.coordinator.async_control_device, commands
+        )
+        for device_id, error in errors.items():
+            _LOGGER.error("Error to shed or restore %s (%s)", device_id, error)
+        await self.coordinator.async_request_refresh()
+        return set(errors)
@@ -5,9 +5,9 @@ import logging
 
 from heatzypy.exception import HeatzyException
 
-from homeassistant.components.switch import SwitchEntity
+from homeassistant.components.switch import DOMAIN as SWITCH_DOMAIN, SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo, EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
@@ -15,6 +15,7 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from . import HeatzyDataUpdateCoordinator
 from .const import (
     ATTR_LOCK_SWITCH,
+    CONF_ALIAS,
     CONF_ATTR,
     CONF_ATTRS,
     CONF_LOCK,
@@ -22,6 +23,7 @@ from .const import (
     DOMAIN,
     PILOTE_V2,
 )
+from .entity import async_add_owned_entities
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,11 +33,19 @@ async def async_setup_entry(
 ) -> None:
     """Set the sensor platform."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
-    entities: list[LockSwitchEntity] = []
-    for unique_id, device in coordinator.data.items():
-        if device.get(CONF_ATTR, {}).get(ATTR_LOCK_SWITCH):
-            entities.append(LockSwitchEntity(coordinator, unique_id))
-    async_add_entities(entities)
+
+    @callback
+    def async_new_switch(unique_id: str) -> LockSwitchEntity | None:
+        """Return lock switch of a device which has one."""
+        if coordinator.data[unique_id].get(CONF_ATTR, {}).get(ATTR_LOCK_SWITCH):
+            return LockSwitchEntity(coordinator, unique_id)
+        return None
+
+    entry.async_on_unload(
+        async_add_owned_entities(
+            coordinator, SWITCH_DOMAIN, {}, async_new_switch, async_add_entities
+        )
+    )
 
 
 class LockSwitchEntity(CoordinatorEntity[HeatzyDataUpdateCoordinator], SwitchEntity):
@@ -51,17 +61,29 @@ class LockSwitchEntity(CoordinatorEntity[HeatzyDataUpdateCoordinator], SwitchEnt
         """Initialize switch."""
         super().__init__(coordinator)
         self._attr_unique_id = unique_id
-        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, unique_id)})
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, unique_id)},
+            name=coordinator.data[unique_id][CONF_ALIAS],
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return True if the device is connected to the cloud."""
+        return super().available and self.coordinator.is_online(self.unique_id)
 
     @property
     def is_on(self) -> bool:
         """Return true if switch is on."""
-        return self.coordinator.data[self.unique_id].get(CONF_ATTR, {}).get(CONF_LOCK)
+        return (
+            self.coordinator.data.get(self.unique_id, {})
+            .get(CONF_ATTR, {})
+            .get(CONF_LOCK)
+        )
 
     async def async_turn_on(self) -> None:
         """Turn the entity on."""
         try:
-            await self.coordinator.api.async_control_device(
+            await self.coordinator.async_control_device(
                 self.unique_id, {CONF_ATTRS: {CONF_LOCK: 1}}
             )
         except HeatzyException as error:
@@ -72,7 +94,7 @@ class LockSwitchEntity(CoordinatorEntity[HeatzyDataUpdateCoordinator], SwitchEnt
     async def async_turn_off(self) -> None:
         """Turn the entity off."""
         try:
-            await self.coordinator.api.async_control_device(
+            await self.coordinator.async_control_device(
                 self.unique_id, {CONF_ATTRS: {CONF_LOCK: 0}}
             )
         except HeatzyException as error:
@@ -0,0 +1,133 @@
+"""Replay a Heatzy cassette against the integration, without the cloud.
+
+Record a cassette with the heatzy.record_cassette service, then run:
+
+    python scripts/replay_cassette.py heatzy_<entry_id>.cassette.json \
+        --speed 10 --multiplicity 50 --polls 5
+
+The integration is set up in a throwaway Home Assistant instance whose client
+requests are served by CassetteTransport. Each poll is timed and the climate
+entities are checked against the replayed devices. Requires homeassistant and
+heatzypy to be installed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def async_replay(args: argparse.Namespace) -> int:
+    """Set up the integration on the cassette and poll it."""
+    from homeassistant import bootstrap, loader
+    from homeassistant.config_entries import ConfigEntries, ConfigEntry
+    from homeassistant.const import CONF_PASSWORD, CONF_USERNAME, STATE_UNAVAILABLE
+    from homeassistant.core import HomeAssistant
+    from homeassistant.setup import async_setup_component
+
+    from custom_components.heatzy import coordinator as heatzy_coordinator
+    from custom_components.heatzy.cassette import CassetteTransport, load_cassette
+    from custom_components.heatzy.const import DOMAIN
+
+    transport = CassetteTransport(
+        await asyncio.get_running_loop().run_in_executor(
+            None, load_cassette, args.cassette
+        ),
+        speed=args.speed,
+        multiplicity=args.multiplicity,
+    )
+
+    class ReplayClient(heatzy_coordinator.HeatzyClient):
+        """Client answered by the cassette."""
+
+        def __init__(self, *client_args, **client_kwargs) -> None:
+            super().__init__(*client_args, **client_kwargs)
+            self.request = transport
+
+    heatzy_coordinator.HeatzyClient = ReplayClient
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.symlink(
+            os.path.join(ROOT, "custom_components"),
+            os.path.join(config_dir, "custom_components"),
+        )
+        hass = HomeAssistant(config_dir)
+        hass.config.skip_pip = True
+        loader.async_setup(hass)
+        await bootstrap.load_registries(hass)
+        hass.config_entries = ConfigEntries(hass, {})
+        await hass.config_entries.async_initialize()
+        await async_setup_component(hass, "homeassistant", {})
+
+        entry = ConfigEntry(
+            version=1,
+            domain=DOMAIN,
+            title="cassette",
+            data={CONF_USERNAME: "replay", CONF_PASSWORD: "replay"},
+            source="user",
+            options={},
+        )
+        start = time.monotonic()
+        await hass.config_entries.async_add(entry)
+        await hass.async_block_till_done()
+        print(f"setup: {time.monotonic() - start:.3f}s, {transport.calls} requests")
+
+        failed = False
+        if (coordinator := hass.data.get(DOMAIN, {}).get(entry.entry_id)) is None:
+            print(f"setup failed: {entry.state}")
+            failed = True
+        else:
+            for poll in range(1, args.polls + 1):
+                calls = transport.calls
+                start = time.monotonic()
+                await coordinator.async_refresh()
+                await hass.async_block_till_done()
+                print(
+                    f"poll {poll}: {time.monotonic() - start:.3f}s,"
+                    f" {transport.calls - calls} requests,"
+                    f" success={coordinator.last_update_success}"
+                )
+                failed |= not coordinator.last_update_success
+
+            states = hass.states.async_all("climate")
+            available = [s for s in states if s.state != STATE_UNAVAILABLE]
+            print(
+                f"devices: {len(coordinator.data)}, climate entities: {len(states)},"
+                f" available: {len(available)}"
+            )
+            for state in states[: args.show]:
+                print(f"  {state.entity_id}: {state.state} {state.attributes}")
+            failed |= not states
+
+        await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_stop(force=True)
+    return 1 if failed else 0
+
+
+def main() -> int:
+    """Parse arguments and run the replay."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassette", help="cassette recorded by heatzy.record_cassette")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="divide recorded latencies, 0 to skip"
+    )
+    parser.add_argument(
+        "--multiplicity", type=int, default=1, help="clone each recorded device"
+    )
+    parser.add_argument("--polls", type=int, default=3, help="refreshes to time")
+    parser.add_argument("--show", type=int, default=5, help="entity states to print")
+    parser.add_argument("--debug", action="store_true", help="debug logging")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    sys.path.insert(0, ROOT)
+    return asyncio.run(async_replay(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())